@@ -3,12 +3,30 @@
 # ---------------------------------------------------------------------------- #
 
 import subprocess
+import asyncio
 import sys
+import os
 import json
 from pathlib import Path
 import re
 import hashlib
+import shutil
+import queue
+import threading
 from datetime import datetime, timezone
+from dataclasses import dataclass
+from functools import cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+try: # optional, lets read-only git queries skip spawning a git process
+    import pygit2
+except ImportError:
+    pygit2 = None
+    
+try: # optional, faster (de)serialisation of release manifests
+    import orjson
+except ImportError:
+    orjson = None
 
 # --------------------------- CONSTANTS DEFINITION --------------------------- #
 MAIN_BRANCH = "main" # the name of the default branch in a repo (usually main / master)
@@ -17,9 +35,13 @@ LFS_PATTERNS = [ # file extensions that should be marked to track LFS
     "*.ipt", "*.iam", "*.kicad_pcb", "*.kicad_sch", "*.step",
     "*.stp", "*.stl", "*.pdf", "*.png", "*.jpg", "*.jpeg"
 ]
-SEMVER = re.compile(r"v(\d+)\.(\d+)\.(\d+)$") # regex for semantic versions
-HOTFIX = re.compile(r"(v\d+\.\d+\.\d+)-hotfix\.(\d+)$") # regex for hotfix versions
+SEMVER = re.compile(r"v(\d+)\.(\d+)\.(\d+)") # regex for semantic versions (use fullmatch)
+HOTFIX = re.compile(r"(v(\d+)\.(\d+)\.(\d+))-hotfix\.(\d+)") # regex for hotfix versions (use fullmatch)
 ARTIFACT_REPO_NAME = "artifacts"
+SYNCED_SUBTREES_FILE = "wm_synced_subtrees" # record of subtrees added to the super repo (in its .git dir)
+HASH_CHUNK_SIZE = 1 << 20 # read size used when hashing files manually (1 MiB)
+READ_AHEAD_THRESHOLD = 8 << 20 # without file_digest, files bigger than this (8 MiB) are hashed with a read-ahead thread
+READ_AHEAD_CHUNK_SIZE = 4 << 20 # read size used by the read-ahead thread (4 MiB)
 
 # ------------------------------ EXCEPTION CLASS ----------------------------- #
 # a custom exception class that every 'application-level' problem will raise
@@ -37,11 +59,64 @@ def git(repo, *args):
     # run a git command in a given repo
     run(["git", *args], repo)
     
+def git_out(repo, *args):
+    # run a git command in a given repo and return its output, decoded once as raw bytes come back
+    return subprocess.run(
+        ["git", *args], cwd=repo, capture_output=True, check=True
+    ).stdout.decode("utf-8", "replace")
+
+async def git_async(repo, *args, capture=False):
+    # run a git command in a given repo without blocking, optionally returning its stdout
+    cmd = ["git", *args]
+    if not capture:
+        print(f"[{repo}] {' '.join(map(str, cmd))}") # log
+        
+    proc = await asyncio.create_subprocess_exec(
+        "git", "-C", str(repo), *args,
+        stdout=asyncio.subprocess.PIPE if capture else None
+    )
+    out, _ = await proc.communicate()
+    
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, out)
+    
+    return out.decode("utf-8", "replace") if capture else None
+
+def git_all(repos, *args, capture=False, check=True):
+    # run the same git command in every repo concurrently, results are in repo order
+    async def gather():
+        return await asyncio.gather(
+            *(git_async(repo, *args, capture=capture) for repo in repos),
+            return_exceptions=True
+        )
+        
+    results = asyncio.run(gather())
+    
+    if check: # re-raise the first failure once every command has finished
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+            
+    return results
+
+_repo_handles = {} # process-wide cache of pygit2 handles, keyed by repo path
+
+def open_repo(repo):
+    # get a cached pygit2 handle for a repo, or None if pygit2 is not installed
+    if pygit2 is None:
+        return None
+    
+    if repo not in _repo_handles:
+        _repo_handles[repo] = pygit2.Repository(str(repo))
+        
+    return _repo_handles[repo]
+    
 def resolve_alias(alias, ws_config):
     # find the project repo's path from its alias: e.g. "node/abc" -> "/bcs/node/abc"
     path_str = ws_config.get("projects", {}).get(alias, alias)
     return ws_config["root"] / path_str
     
+@cache
 def repo_key(repo):    
     return f"{repo.parent.name}/{repo.name}"
     
@@ -50,6 +125,12 @@ def find_repos(selectors, ws_config):
     if not selectors:
         selectors = ["."]
         
+    # every repo registered in the workspace config, these don't need their .git checked
+    projects = {
+        ws_config["root"] / path_str
+        for path_str in ws_config.get("projects", {}).values()
+    }
+        
     repos = set()
     for sel in selectors:
         path = resolve_alias(sel, ws_config)
@@ -58,7 +139,7 @@ def find_repos(selectors, ws_config):
             repos.add(path)
         elif path.is_dir(): # dir is not repo, just container
             for sub in path.iterdir():
-                if (sub / ".git").exists():
+                if sub in projects or (sub / ".git").exists():
                     repos.add(sub)
         else:
             raise WMException("Repo selector not found.")
@@ -84,59 +165,129 @@ def get_new_repo_name(args) -> tuple[str, str]:
     else:
         raise WMException("Invalid repo name")
     
-def sync_to_super(repo, ws_root):
+def synced_subtrees_file(ws_root):
+    # prefixes already added to the super repo, kept in its .git dir so a fresh clone starts without it
+    return ws_root / ".git" / SYNCED_SUBTREES_FILE
+    
+def sync_to_super(repo, ws_config):
     # do the subtree stuff that makes everything work
+    ws_root = ws_config["root"]
     prefix = repo.relative_to(ws_root)
     super_repo = ws_root
+    synced_file = synced_subtrees_file(ws_root)
+    synced = synced_file.read_text().splitlines() if synced_file.exists() else []
     
-    try:
-        subprocess.check_output(["git", "ls-tree", "HEAD", str(prefix)], cwd=super_repo)
-        exists = True
-    except subprocess.CalledProcessError:
-        exists = False
+    exists = prefix.as_posix() in synced
+    if not exists: # not recorded (e.g. older workspace), so ask git once
+        try:
+            exists = bool(git_out(super_repo, "ls-tree", "HEAD", str(prefix)).strip())
+        except subprocess.CalledProcessError:
+            exists = False
         
     if not exists:
         git(super_repo, "subtree", "add", "--prefix", str(prefix), str(repo), MAIN_BRANCH)
     else:
-        git(super_repo, "subtree", "pull", "--prefix", str(prefix), str(repo), MAIN_BRANCH)
+        # the repo's main branch already is the subtree content, so there is nothing to split:
+        # fetch it into a persisted ref (only new objects come across) and merge it under prefix
+        ref = f"refs/subtrees/{repo_key(repo)}"
+        git(super_repo, "fetch", str(repo), f"+{MAIN_BRANCH}:{ref}")
+        git(super_repo, "merge", "--no-commit", "-X", f"subtree={prefix}", ref)
+
+    if prefix.as_posix() not in synced: # remember it so later syncs skip the ls-tree probe
+        with synced_file.open("a") as f:
+            f.write(f"{prefix.as_posix()}\n")
 
     git(super_repo, "add", ".")
     git(super_repo, "commit", "-m", f"sync: {prefix}")
 
+@cache
 def is_binary_repo(repo):
     return (repo / ".bin").exists()
 
-def sha256(path):
-    # calculate SHA256 hash of a file, used for releasing
+def sha256_read_ahead(path):
+    # hash a large file while a background thread reads the next chunks from disk
     h = hashlib.sha256()
+    chunks = queue.Queue(maxsize=2) # bounded so the reader stays at most two chunks ahead
+    errors = []
+    
+    def reader(f):
+        try:
+            for chunk in iter(lambda: f.read(READ_AHEAD_CHUNK_SIZE), b""):
+                chunks.put(chunk)
+        except BaseException as e: # handed to the main thread, not just I/O errors
+            errors.append(e)
+        finally:
+            chunks.put(None) # end of file (or failure)
     
     with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024), b""):
-            h.update(chunk)
+        thread = threading.Thread(target=reader, args=(f,), daemon=True)
+        thread.start()
+        
+        while (chunk := chunks.get()) is not None:
+            h.update(chunk) # releases the GIL, so reading and hashing overlap
             
+        thread.join()
+        
+    if errors: # don't return the hash of a partially read file
+        raise errors[0]
+        
     return h.hexdigest()
 
-def latest_version(repo):
-    # check tags in repo to find the most recent version
-    tags = subprocess.check_output(
-        ["git", "tag"],
-        cwd=repo,
-        text=True
-    ).splitlines()
+def sha256(path):
+    # calculate SHA256 hash of a file, used for releasing
+    if hasattr(hashlib, "file_digest"): # python 3.11+, hashes the whole file in C
+        with path.open("rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        
+    if path.stat().st_size > READ_AHEAD_THRESHOLD:
+        return sha256_read_ahead(path)
     
-    versions = [t for t in tags if SEMVER.match(t) or HOTFIX.match(t)]
+    with path.open("rb") as f:
+        h = hashlib.sha256()
+        buf = bytearray(HASH_CHUNK_SIZE) # reused for every read, no per-chunk allocation
+        mv = memoryview(buf)
+        while n := f.readinto(buf):
+            h.update(mv[:n])
             
-    return sorted(versions)[-1] if versions else "v0.0.0"
+    return h.hexdigest()
 
-def bump_version(repo, bump):
-    # find latest version and bump one part of it to generate next release tag
-    base = latest_version(repo)
+def list_tags(repo):
+    # list every tag in a repo
+    if handle := open_repo(repo):
+        return [
+            ref.removeprefix("refs/tags/")
+            for ref in handle.references
+            if ref.startswith("refs/tags/")
+        ]
+        
+    return git_out(repo, "tag").splitlines()
+
+def version_key(tag):
+    # numeric (major, minor, patch, hotfix) key for a version tag, None if it isn't one
+    if m := SEMVER.fullmatch(tag):
+        return (*map(int, m.groups()), 0)
+    
+    if m := HOTFIX.fullmatch(tag):
+        return tuple(map(int, m.group(2, 3, 4, 5)))
     
-    m = SEMVER.match(base) # gets rid of hotfix
-    if not m:
-        raise WMException("Cannot bump non-semver base")
+    return None
+
+def latest_version(repo, tags=None):
+    # check tags in repo to find the most recent version, returned with its parsed key
+    if tags is None:
+        tags = list_tags(repo)
     
-    major, minor, patch = map(int, m.groups())
+    # single pass, compares numerically so v10.0.0 beats v2.0.0
+    versions = [(key, t) for t in tags if (key := version_key(t))]
+    if not versions:
+        return "v0.0.0", (0, 0, 0, 0)
+    
+    key, tag = max(versions)
+    return tag, key
+
+def bump_version(repo, bump, tags=None):
+    # find latest version and bump one part of it to generate next release tag
+    _, (major, minor, patch, _) = latest_version(repo, tags) # gets rid of hotfix
     
     match bump:
         case "major":
@@ -148,18 +299,15 @@ def bump_version(repo, bump):
     
     raise WMException("Unknown bump keyword")
 
-def next_hotfix(base, repo):
+def next_hotfix(base, repo, tags=None):
     # find the latest hotfix version and bump it
-    tags = subprocess.check_output(
-        ["git", "tag"],
-        cwd=repo,
-        text=True
-    ).splitlines()
+    if tags is None:
+        tags = list_tags(repo)
     
     hotfixes = [
-        int(m.group(2))
+        int(m.group(5))
         for t in tags
-        if (m := HOTFIX.match(t)) and m.group(1) == base
+        if (m := HOTFIX.fullmatch(t)) and m.group(1) == base
     ]
     
     n = max(hotfixes) + 1 if hotfixes else 1
@@ -167,13 +315,14 @@ def next_hotfix(base, repo):
 
 def write_manifest(repo, version, artifact_dir, outputs, mode):
     # write and store a release manifest
-    commit = subprocess.check_output( # get commit details
-        ["git", "rev-parse", "HEAD"], cwd=repo, text=True
-    ).strip()
-    
-    branch = subprocess.check_output( # get branch details
-        ["git", "branch", "--show-current"], cwd=repo, text=True
-    ).strip()
+    if handle := open_repo(repo): # get commit and branch details in-process
+        commit = str(handle.head.target)
+        branch = current_branch(repo)
+    else: # get commit and branch details in one call
+        commit, branch = git_out(repo, "rev-parse", "HEAD", "--abbrev-ref", "HEAD").split()
+        
+        if branch == "HEAD": # detached, match the empty output of `git branch --show-current`
+            branch = ""
 
     artifacts = { # hash checksums
         f.name : {"sha256" : sha256(f)}
@@ -193,19 +342,17 @@ def write_manifest(repo, version, artifact_dir, outputs, mode):
         "artifacts": artifacts
     }
 
-    (artifact_dir / "manifest.json").write_text(
-        json.dumps(manifest, indent=2)
-    )
+    manifest_file = artifact_dir / "manifest.json"
+    if orjson:
+        manifest_file.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    else:
+        manifest_file.write_text(json.dumps(manifest, indent=2))
     
 def get_submodules(repo):
-    result = run(
-        ["git", "submodule", "status"],
-        repo,
-        capture_output=True
-    )
+    out = git_out(repo, "submodule", "status")
 
     submodules = {}
-    for line in result.stdout.splitlines():
+    for line in out.splitlines():
         # ex: 3f42c9179a1bbbd7d7a0e1d2e0d0f7e3c92e4b1f comms/tests (heads/main)
         line = line.strip()
         if not line:
@@ -227,33 +374,38 @@ def build(repo, cfg, dest):
         src = repo / out
         tgt = dest / src.name
         
-        run(["cp", src, tgt], repo)
+        print(f"[cp] {src} → {tgt}") # log
+        shutil.copy(src, tgt) # in-kernel copy (sendfile) on linux, keeps the mode like cp
         outputs.append(tgt)
         
     return outputs
 
 def branch_exists(repo, branch):
     # check if a branch exists
-    out = subprocess.check_output(
-        ["git", "branch", "--list", branch],
-        cwd=repo,
-        text=True
-    ).strip()
+    if handle := open_repo(repo):
+        return f"refs/heads/{branch}" in handle.references
+    
+    out = git_out(repo, "branch", "--list", branch).strip()
     
     return bool(out)
 
 
 def current_branch(repo):
     # check which branch is currently checked out
-    return subprocess.check_output(
-        ["git", "branch", "--show-current"],
-        cwd=repo,
-        text=True
-    ).strip()
+    if handle := open_repo(repo):
+        if handle.head_is_detached:
+            return ""
+
+        if handle.head_is_unborn: # e.g. straight after `git init`, HEAD names a branch with no commits
+            return handle.references["HEAD"].target.removeprefix("refs/heads/")
+
+        return handle.head.shorthand
+    
+    return git_out(repo, "branch", "--show-current").strip()
 
 # ------------------------------- CLI FUNCTIONS ------------------------------ #
-def new_repo(group, name, ws_root):
-    path = ws_root / group / name
+def new_repo(group, name, ws_config):
+    path = ws_config["root"] / group / name
     path.mkdir(parents=True, exist_ok=True)
     
     git(path, "init")
@@ -263,12 +415,12 @@ def new_repo(group, name, ws_root):
     (path / ".gitkeep").write_text("")
     (path / ".gitignore").write_text("*/.vscode\n")
     
-    git(path, "add", ".")
+    git(path, "add", ".gitkeep", ".gitignore")
     git(path, "commit", "-m", "initial commit")
 
     git(path, "checkout", "-b", "dev") # create dev branch and checkout
     
-    sync_to_super(path, ws_root) # sync to super
+    sync_to_super(path, ws_config) # sync to super
     
     print(f"[new] Created {path} as local repo.")
     
@@ -322,10 +474,13 @@ def init_submodules(repos):
     for repo in repos:
         print(f"[init-submodules] Initialising submodules in {repo}.")
         
-        try:
-            git(repo, "submodule", "update", "--init", "--recursive")
-        except subprocess.CalledProcessError:
+    results = git_all(repos, "submodule", "update", "--init", "--recursive", check=False)
+    
+    for repo, result in zip(repos, results):
+        if isinstance(result, subprocess.CalledProcessError):
             print(f"[init-submodules] No submodules found in {repo}, skipping.")
+        elif isinstance(result, BaseException):
+            raise result
             
 def add_submodule(parent_repo, source_repo, mount_path):
     if not (parent_repo / ".git").exists():
@@ -384,22 +539,25 @@ def pull_super_repo(ws_root):
     git(ws_root, "pull")
     print("[pull] Super repo pulled from remote.")
     
-def mark_binary(repos, ws_root):
+def mark_binary(repos, ws_config):
     for repo in repos:
         bin_file = repo / ".bin"
         bin_file.touch(exist_ok=True)
         
         git(repo, "add", ".bin")
         git(repo, "lfs", "install")
-        for pattern in LFS_PATTERNS:
-            git(repo, "lfs", "track", pattern)
+        try: # git-lfs accepts every pattern in one call
+            git(repo, "lfs", "track", *LFS_PATTERNS)
+        except subprocess.CalledProcessError: # older git-lfs, track one at a time
+            for pattern in LFS_PATTERNS:
+                git(repo, "lfs", "track", pattern)
             
         git(repo, "add", ".gitattributes")
-        status = subprocess.check_output(["git", "status", "--porcelain"], cwd=repo, text=True)
+        status = git_out(repo, "status", "--porcelain")
         if status.strip():
             git(repo, "commit", "-m", "chore: mark repo as binary and enable LFS")
         
-        sync_to_super(repo, ws_root)
+        sync_to_super(repo, ws_config)
         
         print(f"[mark-bin] Marked {repo} as binary.")
     
@@ -421,90 +579,115 @@ def build_without_release(repos, ws_config):
         
 def release(repos, ws_config, bump=None, hotfix_base=None):    
     repo0 = repos[0]
-    base = latest_version(repo0)
+    tags = list_tags(repo0) # shared by the version lookups below
 
     if hotfix_base:
-        version = next_hotfix(hotfix_base, repo0)
+        version = next_hotfix(hotfix_base, repo0, tags)
         mode = "hotfix"
     else:
-        version = bump_version(base, bump)
+        version = bump_version(repo0, bump, tags)
         mode = "release"
 
-    for repo in repos:
-        git(repo, "checkout", "main")
-        git(repo, "pull")
-
-    for repo in repos:
-        key = repo_key(repo)
-        if key not in ws_config["builds"]:
-            continue
-
-        release_dir = ARTIFACT_REPO_NAME / key / version
-        outputs = build(repo, ws_config["builds"][key], release_dir)
+    git_all(repos, "checkout", MAIN_BRANCH)
+    
+    # fetch everywhere at once, then only fast-forward the repos that are actually behind
+    git_all(repos, "fetch", "origin", MAIN_BRANCH)
+    behind = git_all(repos, "rev-list", "--count", f"HEAD..origin/{MAIN_BRANCH}", capture=True)
+    
+    stale = [repo for repo, count in zip(repos, behind) if int(count)]
+    if stale:
+        git_all(stale, "merge", "--ff-only", f"origin/{MAIN_BRANCH}")
 
-        write_manifest(
-            repo=repo,
-            version=version,
-            artifact_dir=release_dir,
-            outputs=outputs,
-            mode=mode
-        )
+    jobs = [
+        (repo, ws_config["builds"][key], version, mode, Path(ARTIFACT_REPO_NAME) / key / version)
+        for repo in repos
+        if (key := repo_key(repo)) in ws_config["builds"]
+    ]
+    
+    if jobs: # repos are independent, so build, hash, tag and push them in parallel
+        _repo_handles.clear() # don't let forked workers inherit live libgit2 handles
 
-        git(repo, "tag", "-a", version, "-m", version)
-        git(repo, "push", "--tags")
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(_release_one, *job) for job in jobs]
+            for future in futures:
+                future.result() # propagate any failure
 
-    git(ARTIFACT_REPO_NAME, "add", ".")
+    # the artifact repo and super repo are shared, so update them once every repo is done
+    # only stage the new release dirs rather than walking the whole artifact tree
+    git(ARTIFACT_REPO_NAME, "add", *[str(job[-1].relative_to(ARTIFACT_REPO_NAME)) for job in jobs])
     git(ARTIFACT_REPO_NAME, "commit", "-m", f"{mode}: {version}")
     git(ARTIFACT_REPO_NAME, "push")
     
-    sync_to_super(ws_config["root"] / ARTIFACT_REPO_NAME, ws_config["root"])
+    sync_to_super(ws_config["root"] / ARTIFACT_REPO_NAME, ws_config)
+    
+def _release_one(repo, cfg, version, mode, release_dir):
+    # build, record and tag one repo's release, run in a worker process by release()
+    outputs = build(repo, cfg, release_dir)
+
+    write_manifest(
+        repo=repo,
+        version=version,
+        artifact_dir=release_dir,
+        outputs=outputs,
+        mode=mode
+    )
+
+    git(repo, "tag", "-a", version, "-m", version)
+    git(repo, "push", "--tags")
     
 def status(repos):
-    for repo in repos:
-        branch = subprocess.check_output(
-            ["git", "branch", "--show-current"],
-            cwd=repo,
-            text=True
-        ).strip()
+    # branch and dirty state both come from one porcelain v2 call, run concurrently across repos
+    results = git_all(repos, "status", "--porcelain=v2", "--branch", capture=True)
+    
+    for repo, out in zip(repos, results):
+        branch = ""
+        dirty = False
+        for line in out.splitlines():
+            if line.startswith("# branch.head "):
+                branch = line.removeprefix("# branch.head ")
+                if branch == "(detached)": # match the empty name current_branch gives
+                    branch = ""
+            elif not line.startswith("#"): # any entry line means a change
+                dirty = True
         
-        dirty = subprocess.check_output(
-            ["git", "status", "--porcelain"],
-            cwd=repo,
-            text=True
-        ).strip() != ""
-        
-        lfs = ".gitattributes" in [p.name for p in (repo / ".").glob("*gitattributes")]
+        lfs = (repo / ".gitattributes").is_file()
         binary = is_binary_repo(repo)
         
         print(f"{repo_key(repo)} | branch: {branch} | binary: {binary} | LFS: {lfs} | dirty: {dirty}")
 
 def verify_release(version, repo_filter=None):
     failures = False
+    checks = [] # (repo, name, future hash or None if missing, expected hash) for every artifact
+
+    # hash in parallel (hashlib releases the GIL) while the manifests are still being read
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        # layout is artifacts/<group>/<name>/<version>/manifest.json, so don't walk the whole tree
+        for manifest in Path(ARTIFACT_REPO_NAME).glob(f"*/*/{version}/manifest.json"):
+            raw = manifest.read_bytes()
+            data = orjson.loads(raw) if orjson else json.loads(raw)
+            
+            if data["version"] != version:
+                continue
+            
+            if repo_filter and data["repo"] not in repo_filter:
+                continue
 
-    for manifest in ARTIFACT_REPO_NAME.rglob("manifest.json"):
-        data = json.loads(manifest.read_text())
-        
-        if data["version"] != version:
-            continue
-        
-        if repo_filter and data["repo"] not in repo_filter:
-            continue
-
-        release_dir = manifest.parent
+            release_dir = manifest.parent
 
-        for name, meta in data["artifacts"].items():
-            path = release_dir / name
-            if not path.exists():
-                print(f"[FAIL] {data['repo']} missing {name}")
+            for name, meta in data["artifacts"].items():
+                path = release_dir / name
+                actual = pool.submit(sha256, path) if path.exists() else None
+                checks.append((data["repo"], name, actual, meta["sha256"]))
+        
+        for repo, name, actual, expected in checks: # report in submission order
+            if actual is None:
+                print(f"[FAIL] {repo} missing {name}")
                 failures = True
-                continue
-
-            actual = sha256(path)
-            if actual != meta["sha256"]:
-                print(f"[FAIL] {data['repo']} {name} hash mismatch")
+            elif actual.result() != expected:
+                print(f"[FAIL] {repo} {name} hash mismatch")
                 failures = True
             else:
-                print(f"[OK] {data['repo']} {name}")
+                print(f"[OK] {repo} {name}")
 
     if failures:
         sys.exit(1)
@@ -525,15 +708,16 @@ def switch_branch(branch, repo):
     raise WMException(f"{repo_key(repo)} (no {branch})")
     
 def list_current_branch(repos):
-    for repo in repos:
-        print(f"{repo_key(repo)} → {current_branch(repo)}")
+    if pygit2 is None: # no in-process handles, query every repo concurrently
+        branches = [out.strip() for out in git_all(repos, "branch", "--show-current", capture=True)]
+    else:
+        branches = [current_branch(repo) for repo in repos]
+        
+    for repo, branch in zip(repos, branches):
+        print(f"{repo_key(repo)} → {branch}")
         
 def list_all_branches(repo):
-    out = subprocess.check_output(
-        ["git", "branch"],
-        cwd=repo,
-        text=True
-    )
+    out = git_out(repo, "branch")
     
     print(out.rstrip())
 
@@ -579,13 +763,24 @@ def finish_branch(kind, name, repo):
     print(f"[finish] {repo_key(repo)} {branch} → {', '.join(targets)}")
 
 # -------------------------------- CLI HANDLER ------------------------------- #
-def main():
-    if len(sys.argv) < 2:
+@dataclass(frozen=True)
+class CliArgs:
+    # the command line split up once: main.py <cmd> <ws_alias> [args...]
+    cmd: str
+    ws_alias: str
+    args: list[str]
+    rest: list[str] # args after the first, for commands that take a leading value
+
+def parse_cli(argv):
+    if len(argv) < 3:
         raise WMException("No subcommand provided")
     
-    cmd = sys.argv[1]
-    ws_alias = sys.argv[2]
-    args = sys.argv[3:]
+    args = argv[3:]
+    return CliArgs(cmd=argv[1], ws_alias=argv[2], args=args, rest=args[1:])
+
+def main():
+    cli = parse_cli(sys.argv)
+    cmd, ws_alias, args, rest = cli.cmd, cli.ws_alias, cli.args, cli.rest
     
     ws_root = get_ws_root(ws_alias)
     if ws_root is None:
@@ -598,12 +793,12 @@ def main():
     
     match cmd:
         case "new":
-            new_repo(*get_new_repo_name(args), ws_root)
+            new_repo(*get_new_repo_name(args), ws_config)
         case "super-init":
             init_super_repo(ws_root, args[0] if args else None)
         case "super-sync":
             for repo in find_repos(args, ws_config):
-                sync_to_super(repo, ws_root)
+                sync_to_super(repo, ws_config)
         case "super-commit":
             commit_workspace_changes(ws_root)
         case "super-push":
@@ -614,42 +809,43 @@ def main():
             repos = find_repos(args or ["."], ws_config)
             init_submodules(repos)
         case "submodule-add":
-            add_submodule(find_repos(args[0], ws_config)[0], find_repos(args[1], ws_config)[0], args[2])
+            add_submodule(find_repos([args[0]], ws_config)[0], find_repos([args[1]], ws_config)[0], args[2])
         case "submodule-update":
-            update_submodule(find_repos(args[0], ws_config)[0], args[1], args[2] if len(args) > 2 else None)
+            update_submodule(find_repos([args[0]], ws_config)[0], args[1], args[2] if len(args) > 2 else None)
         case "mark-bin":
             repos = find_repos(args, ws_config)
-            mark_binary(repos, ws_root)
+            mark_binary(repos, ws_config)
         case "build":
             repos = find_repos(args, ws_config)
-            build(repos, ws_config)
+            build_without_release(repos, ws_config)
         case "status":
             repos = find_repos(args, ws_config)
             status(repos)
         case "release":
             bump = args[0]
-            repos = find_repos(args[1:])
-            release(repos, bump)
+            repos = find_repos(rest, ws_config)
+            release(repos, ws_config, bump=bump)
         case "release-hotfix":
             base = args[0]
-            repos = find_repos(args[1:])
-            release(repos, hotfix_base=base)
+            repos = find_repos(rest, ws_config)
+            release(repos, ws_config, hotfix_base=base)
         case "release-verify":
             version = args[0]
-            repos = find_repos(args[1:])
-            verify_release(version, repos)
+            # manifests name their repo as "group/name", no selector means every repo
+            repo_filter = {repo_key(r) for r in find_repos(rest, ws_config)} if rest else None
+            verify_release(version, repo_filter)
         case "branch-checkout":
-            checkout_branch(args[0], find_repos(args[1:])[0])
+            checkout_branch(args[0], find_repos(rest, ws_config)[0])
         case "branch-switch":
-            switch_branch(args[0], find_repos(args[1:])[0])
+            switch_branch(args[0], find_repos(rest, ws_config)[0])
         case "branch-list-current":
             list_current_branch(find_repos(args, ws_config))
         case "branch-list-all":
-            list_all_branches(find_repos(args[1:])[0])
+            list_all_branches(find_repos(args, ws_config)[0])
         case "branch-start":
-            start_branch(args[0], args[1], find_repos(args[1:])[0])
+            start_branch(args[0], args[1], find_repos(args[2:], ws_config)[0])
         case "branch-finish":
-            finish_branch(args[0], args[1], find_repos(args[1:])[0])
+            finish_branch(args[0], args[1], find_repos(args[2:], ws_config)[0])
         case _:
             raise WMException("Unknown command")
             